@@ -0,0 +1 @@
+# Keeps backend/ on sys.path so tests import `services.*` the way main.py does
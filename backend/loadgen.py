@@ -0,0 +1,102 @@
+"""
+Local load generator — drives a mixed authorization/dashboard/history workload
+against a running backend and reports status codes and latency per endpoint.
+
+    python loadgen.py --url http://localhost:8000 --concurrency 200 --duration 20
+
+Use it to watch admission control: dashboards and history should shed to 503
+(or 429 per client) while /predict keeps answering, degraded responses are
+counted separately via the X-FraudShield-Degraded header. Every request comes
+from one address, so raise ADMISSION_IP_RATE / ADMISSION_IP_BURST on the server
+to look at shedding rather than the per-IP bucket.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+_PREDICT_BODY = json.dumps({
+    "amount": 4999.99,
+    "currency": "USD",
+    "merchant": {"name": "Binance Crypto", "mcc": "6051", "country": "MT"},
+    "device": {"fingerprint": "fp_xyz123", "ip_address": "185.33.21.99", "country": "MT"},
+}).encode()
+
+ENDPOINTS = {
+    "predict":      ("POST", "/api/v1/predict"),
+    "metrics":      ("GET",  "/api/v1/metrics"),
+    "transactions": ("GET",  "/api/v1/transactions?limit=50"),
+}
+
+
+def _request(base: str, name: str, api_key: str):
+    method, path = ENDPOINTS[name]
+    req = urllib.request.Request(
+        base + path,
+        data=_PREDICT_BODY if method == "POST" else None,
+        method=method,
+        headers={"Content-Type": "application/json", "X-API-Key": api_key},
+    )
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            resp.read()
+            status = resp.status
+            if resp.headers.get("X-FraudShield-Degraded"):
+                status = f"{status}-degraded"
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = "error"
+    return name, status, (time.perf_counter() - t0) * 1000
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--clients", type=int, default=20, help="distinct X-API-Key values")
+    parser.add_argument("--mix", default="predict=6,metrics=3,transactions=1",
+                        help="endpoint weights, e.g. predict=6,metrics=3,transactions=1")
+    args = parser.parse_args()
+
+    weights = {k: float(v) for k, v in (p.split("=") for p in args.mix.split(","))}
+    names, w = list(weights), list(weights.values())
+    keys = [f"loadgen-{i}" for i in range(args.clients)]
+
+    statuses = defaultdict(Counter)
+    latencies = defaultdict(list)
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def worker():
+        while time.monotonic() < deadline:
+            name, status, ms = _request(args.url, random.choices(names, w)[0], random.choice(keys))
+            with lock:
+                statuses[name][status] += 1
+                latencies[name].append(ms)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(worker)
+
+    print(f"{'endpoint':<14}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}  statuses")
+    for name in names:
+        lat = latencies[name]
+        codes = ", ".join(f"{k}: {v}" for k, v in sorted(statuses[name].items(), key=str))
+        print(f"{name:<14}{len(lat):>10}{_percentile(lat, 50):>10.1f}{_percentile(lat, 99):>10.1f}  {codes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,34 @@
+from contextlib import asynccontextmanager
+import asyncio
+import time
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import time
+from fastapi.responses import JSONResponse
 
 from routers.inference import router as inference_router
 from routers.dashboard import router as dashboard_router
 from routers.transactions import router as transactions_router
 from routers.mlops import router as mlops_router
 from routers.stream import router_stream
+from services.admission import AdmissionController, AdmissionMiddleware
+from services.startup import BootReport, boot, process_start
+
+# Timed from process start, so the first stage covers interpreter startup and the imports above
+boot_report = BootReport(t0=process_start())
+boot_report.mark("imports")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Boot in the background so the server accepts connections immediately:
+    # /health/live answers during warmup and /health/ready returns 503 until it ends
+    app.state.boot_task = asyncio.create_task(boot(boot_report))
+    yield
+    app.state.boot_task.cancel()
+    # uvicorn re-raises the exit signal after shutdown, so atexit hooks never run
+    admission.close()
+
 
 app = FastAPI(
     title="FraudShield AI — Real-Time Fraud Detection API",
@@ -14,6 +36,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 import os
@@ -24,12 +47,18 @@ raw_origins = os.environ.get(
 )
 origins = [origin.strip().rstrip("/") for origin in raw_origins.split(",") if origin.strip()]
 
+# Admission control sits inside CORS so 429/503 responses still carry CORS headers
+admission = AdmissionController.from_env()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the dashboard see degraded (rules-only) answers and shed back-off hints
+    expose_headers=["X-FraudShield-Degraded", "Retry-After"],
 )
 
 # Register all routers
@@ -52,9 +81,22 @@ async def health_check():
             "postgres_db":      "online",
             "ml_models":        "online",
         },
+        "admission": admission.snapshot(),
     }
 
 
+@app.get("/health/live", tags=["System"])
+async def liveness():
+    """Process is up and serving; says nothing about scoring readiness."""
+    return {"status": "alive", "timestamp": time.time()}
+
+
+@app.get("/health/ready", tags=["System"])
+async def readiness():
+    """200 only after the snapshot is mapped and warmup has reached steady-state p99."""
+    return JSONResponse(boot_report.as_dict(), status_code=200 if boot_report.ready else 503)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
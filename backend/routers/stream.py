@@ -1,4 +1,5 @@
 import asyncio
+import json
 import random
 import uuid
 from datetime import datetime
@@ -24,7 +25,6 @@ async def _event_generator():
             "location": tx["device"]["location"],
             "timestamp": tx["timestamp"],
         }
-        import json
         yield f"data: {json.dumps(data)}\n\n"
         await asyncio.sleep(0.8)
 
@@ -4,6 +4,7 @@ import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import APIRouter, Query
+from services.explainer import ReasonCode, ReasonEngine, RuleTable, feature_vector
 
 router = APIRouter(prefix="/api/v1", tags=["Transactions"])
 
@@ -37,17 +38,33 @@ HIGH_RISK_COUNTRIES = {"NG", "KP", "IR", "MT", "BY"}
 
 CURRENCIES = ["USD", "EUR", "GBP", "INR", "AED", "SGD", "AUD"]
 
+RULES = RuleTable(
+    base=0.05,
+    amount_bands=[(10000, 0.35), (5000, 0.25), (2000, 0.15), (1000, 0.08)],
+    mcc_weight=0.22,
+    country_weight=0.30,
+)
+REASONS = ReasonEngine(
+    RULES,
+    codes={
+        "amount":            ReasonCode("R01_AMOUNT",  "High transaction amount: ${amount:,.2f}"),
+        "high_risk_mcc":     ReasonCode("R02_MCC",     "High-risk MCC: {mcc}"),
+        "high_risk_country": ReasonCode("R03_COUNTRY", "High-risk country: {country}"),
+    },
+    min_contribution=0.1,
+)
+
+
+def _features(amount: float, mcc: str, country: str) -> tuple:
+    return feature_vector(amount, mcc, country, HIGH_RISK_MCC, HIGH_RISK_COUNTRIES)
 
-def _compute_risk(amount: float, mcc: str, country: str, merchant_name: str) -> dict:
-    risk = 0.05
-    if amount > 10000: risk += 0.35
-    elif amount > 5000: risk += 0.25
-    elif amount > 2000: risk += 0.15
-    elif amount > 1000: risk += 0.08
 
-    if country in HIGH_RISK_COUNTRIES: risk += 0.30
-    if mcc in HIGH_RISK_MCC: risk += 0.22
+def _reason_context(amount: float, mcc: str, country: str) -> dict:
+    return {"amount": amount, "mcc": mcc, "country": country}
 
+
+def _compute_risk(amount: float, mcc: str, country: str, merchant_name: str) -> dict:
+    risk = RULES.score(_features(amount, mcc, country))
     risk = min(0.97, max(0.02, risk + (random.random() - 0.5) * 0.08))
 
     xgb = round(min(0.99, max(0.01, risk + (random.random() - 0.5) * 0.06)), 4)
@@ -71,7 +88,7 @@ def _compute_risk(amount: float, mcc: str, country: str, merchant_name: str) ->
     )
 
 
-def _generate_transaction(offset_seconds: int = 0) -> dict:
+def _generate_transaction(offset_seconds: int = 0, explain: bool = True) -> dict:
     merchant_name, category, mcc, m_country = random.choice(MERCHANTS)
     location, country = random.choice(LOCATIONS)
     amount = round(random.choices(
@@ -86,10 +103,10 @@ def _generate_transaction(offset_seconds: int = 0) -> dict:
     risk = _compute_risk(amount, mcc, country, merchant_name)
 
     txn_id = f"TXN-{uuid.uuid4().hex[:12].upper()}"
+    # get_transactions fills reasons for the whole page with one explain_batch call
     reasons = []
-    if amount > 2000: reasons.append(f"High transaction amount: ${amount:,.2f}")
-    if country in HIGH_RISK_COUNTRIES: reasons.append(f"High-risk country: {country}")
-    if mcc in HIGH_RISK_MCC: reasons.append(f"High-risk MCC: {mcc}")
+    if explain:
+        reasons = REASONS.messages(_features(amount, mcc, country), _reason_context(amount, mcc, country))
 
     return {
         "id": txn_id,
@@ -118,5 +135,11 @@ def _generate_transaction(offset_seconds: int = 0) -> dict:
 @router.get("/transactions")
 async def get_transactions(limit: int = Query(default=30, le=100)):
     """Return `limit` recent simulated transactions with full ML scoring."""
-    txns = [_generate_transaction(offset_seconds=i * 18) for i in range(limit)]
+    txns = [_generate_transaction(offset_seconds=i * 18, explain=False) for i in range(limit)]
+    rows = []
+    for t in txns:
+        args = (t["amount"], t["merchant"]["mcc"], t["device"]["country"])
+        rows.append((_features(*args), _reason_context(*args)))
+    for t, reasons in zip(txns, REASONS.explain_batch(rows)):
+        t["fraudReasons"] = [r.message for r in reasons]
     return {"transactions": txns, "total": limit, "timestamp": datetime.utcnow().isoformat() + "Z"}
@@ -0,0 +1,436 @@
+"""
+Admission control — per-client token buckets plus a priority concurrency limiter.
+
+Requests are classified by path into priority classes:
+  AUTHORIZATION (/predict)  >  DASHBOARD (metrics, alerts)  >  HISTORY (everything else)
+A class is admitted only while total in-flight work across all workers is below
+its share of ADMISSION_MAX_CONCURRENCY, so dashboards and history queries are
+shed first and authorization scoring keeps the headroom.
+
+Limiter state lives in a /dev/shm file that every uvicorn worker on the host maps
+and locks with flock, so all workers see the same buckets and in-flight counts.
+Where /dev/shm or fcntl is unavailable (e.g. Windows/macOS dev boxes) the state
+falls back to process-local memory. Each worker calls close() on lifespan shutdown
+and the last one out unlinks the file; after a crash it is left in /dev/shm and
+reused by the next start with the same ADMISSION_SHM_NAME.
+
+Every request is charged to a per-IP bucket and, when it sends X-API-Key or
+X-Merchant-Id, to that key's bucket as well; the headers are not authenticated,
+so the IP bucket is what bounds a client rotating them. Behind a load balancer
+the peer address is the proxy's, so ADMISSION_TRUSTED_PROXIES lists the proxy
+networks whose X-Forwarded-For is believed: the client is the rightmost entry
+not in those networks, and entries a client prepends itself are ignored.
+
+Over the limit the middleware answers immediately: 429 when the client's bucket
+is empty, 503 when the class is shed — or, for /predict with the fallback
+enabled, a rules-only decision flagged with X-FraudShield-Degraded.
+"""
+import hashlib
+import ipaddress
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+
+from models.schemas import TransactionRequest
+from services.fraud_scorer import run_rules_only
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+AUTHORIZATION, DASHBOARD, HISTORY = 0, 1, 2
+CLASS_NAMES = ("authorization", "dashboard", "history")
+# Fraction of max concurrency each class may fill before it is shed
+CLASS_SHARES = (1.0, 0.75, 0.5)
+
+ADMITTED, RATE_LIMITED, OVERLOADED = "admitted", "rate_limited", "overloaded"
+
+_DASHBOARD_PREFIXES = ("/api/v1/metrics", "/api/v1/alerts")
+# Long-lived or system endpoints: rate limited but never hold a concurrency slot
+_UNMETERED_PREFIXES = ("/api/v1/stream",)
+_EXEMPT_PREFIXES = ("/health", "/docs", "/redoc", "/openapi.json")
+
+# Shared-memory layout: worker slots, then bucket slots. The segment is a plain
+# tmpfs file; multiprocessing.shared_memory would cost ~80 ms of imports per boot
+# (resource_tracker, pickle, spawn) for the same mapping.
+_SHM_DIR = "/dev/shm"
+_WORKER_SLOTS = 64
+_WORKER_FMT = "<qqqq"            # pid, in-flight per class
+_BUCKET_FMT = "<Qdd"             # key hash, tokens, last refill timestamp
+_WORKER_SIZE = struct.calcsize(_WORKER_FMT)
+_BUCKET_SIZE = struct.calcsize(_BUCKET_FMT)
+_PROBE = 8
+
+
+def classify(path: str) -> Optional[int]:
+    """Priority class for a request path, or None if it bypasses admission."""
+    if path.startswith(_EXEMPT_PREFIXES):
+        return None
+    if path.startswith("/api/v1/predict"):
+        return AUTHORIZATION
+    if path.startswith(_DASHBOARD_PREFIXES):
+        return DASHBOARD
+    return HISTORY
+
+
+def _key_hash(key: str) -> int:
+    # Stable across processes (builtin hash() is salted per interpreter)
+    h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+    return h or 1  # 0 marks an empty bucket slot
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class _SharedState:
+    """Mapped /dev/shm file doubling as its own flock; process-local if unavailable."""
+
+    def __init__(self, name: Optional[str], size: int):
+        self._name = name
+        self._size = size
+        self._fd = None
+        self._map = None
+        self._thread_lock = threading.Lock()
+        self._open()
+
+    @property
+    def _path(self) -> str:
+        return os.path.join(_SHM_DIR, self._name)
+
+    def _open(self) -> None:
+        if self._name and fcntl is not None and os.path.isdir(_SHM_DIR):
+            try:
+                self._fd = self._open_segment(self._path, self._size)
+                self._map = mmap.mmap(self._fd, self._size)
+            except OSError:
+                if self._fd is not None:
+                    os.close(self._fd)
+                self._fd = self._map = None
+        self.buf = memoryview(self._map) if self._map is not None else memoryview(bytearray(self._size))
+        self.shared = self._map is not None
+
+    @staticmethod
+    def _open_segment(path: str, size: int) -> int:
+        # Size a private file, then link it into place: joiners never map a short file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            os.link(tmp, path)
+            return fd
+        except FileExistsError:
+            os.close(fd)
+        finally:
+            os.unlink(tmp)
+
+        fd = os.open(path, os.O_RDWR)
+        if os.fstat(fd).st_size < size:
+            os.close(fd)
+            raise OSError(f"shared segment {path!r} is smaller than expected")
+        return fd
+
+    def stale(self) -> bool:
+        """True if, while we waited for the lock, the last worker unlinked the file we mapped."""
+        if not self.shared:
+            return False
+        try:
+            return os.fstat(self._fd).st_ino != os.stat(self._path).st_ino
+        except FileNotFoundError:
+            return True
+
+    def unlink(self) -> None:
+        """Remove the segment; late joiners notice via stale(). Call under the lock."""
+        if not self.shared:
+            return
+        try:
+            os.unlink(self._path)
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        if self._map is None:
+            return
+        self.buf.release()
+        self.buf = None
+        self._map.close()
+        os.close(self._fd)
+        self._fd = self._map = None
+
+    def reopen(self) -> None:
+        self.close()
+        self._open()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self.buf
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+class AdmissionController:
+    """Token-bucket rate limiting and priority concurrency limiting over shared state."""
+
+    def __init__(self, max_concurrency: int = 64, rate: float = 50.0, burst: float = 100.0,
+                 ip_rate: float = 200.0, ip_burst: float = 400.0,
+                 bucket_slots: int = 4096, shm_name: Optional[str] = "fraudshield_admission"):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+        self._bucket_slots = bucket_slots
+        self._bucket_base = _WORKER_SLOTS * _WORKER_SIZE
+        size = self._bucket_base + bucket_slots * _BUCKET_SIZE
+        # Segment name is tied to the layout so a resized config never maps a stale segment
+        name = f"{shm_name}_{bucket_slots}" if shm_name else None
+        self._state = _SharedState(name, size)
+        self._pid = os.getpid()
+        self._slot = self._claim_worker_slot()
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_concurrency=int(os.environ.get("ADMISSION_MAX_CONCURRENCY", "64")),
+            rate=float(os.environ.get("ADMISSION_RATE", "50")),
+            burst=float(os.environ.get("ADMISSION_BURST", "100")),
+            ip_rate=float(os.environ.get("ADMISSION_IP_RATE", "200")),
+            ip_burst=float(os.environ.get("ADMISSION_IP_BURST", "400")),
+            shm_name=os.environ.get("ADMISSION_SHM_NAME", "fraudshield_admission") or None,
+        )
+
+    # ── worker slots ────────────────────────────────────────────────────────
+
+    def _claim_worker_slot(self) -> int:
+        while True:
+            with self._state as buf:
+                if not self._state.stale():
+                    return self._claim_free_slot(buf)
+            # The last worker unlinked the segment while we were attaching: start a fresh one
+            self._state.reopen()
+
+    def _claim_free_slot(self, buf) -> int:
+        free = None
+        for i in range(_WORKER_SLOTS):
+            off = i * _WORKER_SIZE
+            pid = struct.unpack_from("<q", buf, off)[0]
+            if pid and pid != self._pid and not _pid_alive(pid):
+                # Crashed worker: drop the in-flight counts it leaked
+                struct.pack_into(_WORKER_FMT, buf, off, 0, 0, 0, 0)
+                pid = 0
+            if pid == self._pid or (free is None and pid == 0):
+                free = i
+        if free is None:
+            raise RuntimeError(f"more than {_WORKER_SLOTS} workers share the admission segment")
+        struct.pack_into(_WORKER_FMT, buf, free * _WORKER_SIZE, self._pid, 0, 0, 0)
+        return free
+
+    def close(self) -> None:
+        """Release this worker's slot; the last live worker unlinks the segment."""
+        if self._state.buf is None:
+            return
+        with self._state as buf:
+            struct.pack_into(_WORKER_FMT, buf, self._slot * _WORKER_SIZE, 0, 0, 0, 0)
+            if not any(self._live_workers(buf)):
+                self._state.unlink()
+        self._state.close()
+
+    def _live_workers(self, buf):
+        for i in range(_WORKER_SLOTS):
+            pid = struct.unpack_from("<q", buf, i * _WORKER_SIZE)[0]
+            if pid and _pid_alive(pid):
+                yield pid
+
+    def _in_flight(self, buf) -> int:
+        total = 0
+        for i in range(_WORKER_SLOTS):
+            pid, a, d, h = struct.unpack_from(_WORKER_FMT, buf, i * _WORKER_SIZE)
+            if pid:
+                total += a + d + h
+        return total
+
+    def _add_in_flight(self, buf, cls: int, delta: int) -> None:
+        off = self._slot * _WORKER_SIZE + 8 * (cls + 1)
+        struct.pack_into("<q", buf, off, struct.unpack_from("<q", buf, off)[0] + delta)
+
+    # ── token buckets ───────────────────────────────────────────────────────
+
+    def _take_token(self, buf, key: str, now: float, rate: float, burst: float) -> bool:
+        h = _key_hash(key)
+        start = h % self._bucket_slots
+        idle = None
+        for p in range(_PROBE):
+            off = self._bucket_base + ((start + p) % self._bucket_slots) * _BUCKET_SIZE
+            slot_key, tokens, stamp = struct.unpack_from(_BUCKET_FMT, buf, off)
+            if slot_key == h:
+                tokens = min(burst, tokens + (now - stamp) * rate)
+                allowed = tokens >= 1.0
+                struct.pack_into(_BUCKET_FMT, buf, off, h, tokens - 1.0 if allowed else tokens, now)
+                return allowed
+            # A slot whose bucket has refilled carries no state, so reusing it loses nothing
+            if idle is None and (slot_key == 0 or tokens + (now - stamp) * rate >= burst):
+                idle = off
+        if idle is None:
+            # Every probed slot belongs to an active client: refuse the newcomer rather
+            # than evicting someone's partly drained bucket and granting a fresh burst
+            return False
+        struct.pack_into(_BUCKET_FMT, buf, idle, h, burst - 1.0, now)
+        return True
+
+    # ── public API ──────────────────────────────────────────────────────────
+
+    def admit(self, client_ip: str, api_key: Optional[str], cls: int, hold: bool = True) -> str:
+        """
+        Check rate limits and capacity; on ADMITTED with hold, call release(cls) when done.
+        The per-IP bucket is charged unless ip_rate is 0, so rotating unauthenticated
+        X-API-Key / X-Merchant-Id values cannot mint fresh bursts.
+        """
+        now = time.time()
+        with self._state as buf:
+            if self.ip_rate > 0 and not self._take_token(buf, f"ip:{client_ip}", now, self.ip_rate, self.ip_burst):
+                return RATE_LIMITED
+            if api_key and not self._take_token(buf, f"key:{api_key}", now, self.rate, self.burst):
+                return RATE_LIMITED
+            if not hold:
+                return ADMITTED
+            if self._in_flight(buf) >= self.max_concurrency * CLASS_SHARES[cls]:
+                return OVERLOADED
+            self._add_in_flight(buf, cls, 1)
+            return ADMITTED
+
+    def release(self, cls: int) -> None:
+        with self._state as buf:
+            self._add_in_flight(buf, cls, -1)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._state as buf:
+            per_class = [0, 0, 0]
+            workers = 0
+            for i in range(_WORKER_SLOTS):
+                pid, *counts = struct.unpack_from(_WORKER_FMT, buf, i * _WORKER_SIZE)
+                if pid and _pid_alive(pid):
+                    workers += 1
+                    per_class = [a + b for a, b in zip(per_class, counts)]
+        return {
+            "shared": self._state.shared,
+            "workers": workers,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": dict(zip(CLASS_NAMES, per_class)),
+        }
+
+
+# ── ASGI middleware ──────────────────────────────────────────────────────────
+
+_Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def _parse_networks(spec: str) -> List[_Network]:
+    """Comma-separated addresses or CIDR blocks, e.g. "10.0.0.0/8,127.0.0.1"."""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in spec.split(",") if part.strip()]
+
+
+def _trusted(addr: str, networks: List[_Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(addr)
+    except ValueError:
+        return False
+    return any(ip in net for net in networks)
+
+
+def _client_keys(scope, trusted_proxies: List[_Network] = ()) -> Tuple[str, Optional[str]]:
+    """(client IP, X-API-Key / X-Merchant-Id value if sent)."""
+    client = scope.get("client")
+    ip = client[0] if client else "unknown"
+    headers = dict(scope.get("headers") or [])
+    forwarded = headers.get(b"x-forwarded-for")
+    if forwarded and _trusted(ip, trusted_proxies):
+        # Each proxy appends the address it saw: walk back past our own proxies
+        for hop in reversed(forwarded.decode("latin-1").split(",")):
+            ip = hop.strip() or ip
+            if not _trusted(ip, trusted_proxies):
+                break
+    for name in (b"x-api-key", b"x-merchant-id"):
+        value = headers.get(name)
+        if value:
+            return ip, f"{name.decode()}:{value.decode('latin-1')}"
+    return ip, None
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware so rejected requests never reach routing or validation."""
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None,
+                 predict_fallback: Optional[bool] = None, trusted_proxies: Optional[str] = None):
+        self.app = app
+        self.controller = controller or AdmissionController.from_env()
+        if predict_fallback is None:
+            predict_fallback = os.environ.get("ADMISSION_PREDICT_FALLBACK", "1") == "1"
+        self.predict_fallback = predict_fallback
+        if trusted_proxies is None:
+            trusted_proxies = os.environ.get("ADMISSION_TRUSTED_PROXIES", "")
+        self.trusted_proxies = _parse_networks(trusted_proxies)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+        cls = classify(scope["path"])
+        if cls is None:
+            return await self.app(scope, receive, send)
+
+        hold = not scope["path"].startswith(_UNMETERED_PREFIXES)
+        client_ip, api_key = _client_keys(scope, self.trusted_proxies)
+        verdict = self.controller.admit(client_ip, api_key, cls, hold=hold)
+        if verdict == RATE_LIMITED:
+            return await self._reject(scope, receive, send, 429, "Rate limit exceeded")
+        if verdict == OVERLOADED:
+            if cls == AUTHORIZATION and self.predict_fallback and scope["method"] == "POST":
+                return await self._rules_only(scope, receive, send)
+            return await self._reject(scope, receive, send, 503, f"Shedding {CLASS_NAMES[cls]} traffic")
+
+        if not hold:
+            return await self.app(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(cls)
+
+    @staticmethod
+    async def _reject(scope, receive, send, status: int, detail: str):
+        response = JSONResponse({"detail": detail}, status_code=status, headers={"Retry-After": "1"})
+        await response(scope, receive, send)
+
+    async def _rules_only(self, scope, receive, send):
+        try:
+            tx = TransactionRequest.model_validate_json(await _read_body(receive))
+        except ValidationError:
+            return await self._reject(scope, receive, send, 503, "Shedding authorization traffic")
+        result = run_rules_only(tx)
+        response = JSONResponse(result.model_dump(mode="json"), headers={"X-FraudShield-Degraded": "rules-only"})
+        await response(scope, receive, send)
@@ -0,0 +1,304 @@
+"""
+Explanation engine — additive per-feature contributions mapped to reason codes.
+
+Every contribution source declares its feature layout in `features` and returns
+one value per entry such that expected_value + sum(contributions) reproduces
+the model output:
+  * RuleTable    — precomputed contribution tables for the rule-based scorers
+  * TreeEnsemble — exact TreeSHAP (path-dependent) for XGBoost/LightGBM trees
+
+ReasonEngine ranks the contributions, keeps the top-k above a floor and renders
+templated messages. Ranked reasons are cached per feature-vector signature, so
+explaining a transaction is a dict lookup plus string formatting on the hot path.
+"""
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+# Feature vector layout of the rule-based scorers (see feature_vector)
+FEATURES = ("amount", "high_risk_mcc", "high_risk_country")
+
+
+def feature_vector(amount: float, mcc: str, country: str,
+                   high_risk_mcc: Iterable[str], high_risk_countries: Iterable[str]) -> Tuple[float, ...]:
+    return (
+        float(amount),
+        1.0 if mcc in high_risk_mcc else 0.0,
+        1.0 if country in high_risk_countries else 0.0,
+    )
+
+
+@dataclass(frozen=True)
+class ReasonCode:
+    code: str
+    template: str  # str.format template, filled from the per-transaction context
+
+
+@dataclass(frozen=True)
+class Reason:
+    code: str
+    feature: str
+    contribution: float
+    message: str
+
+
+# ── Rule contribution tables ─────────────────────────────────────────────────
+
+class RuleTable:
+    """
+    Additive rule scorer expressed as a lookup table.
+    amount_bands is a list of (lower_bound, contribution) pairs; the highest band
+    whose bound is strictly exceeded applies. Signatures are the discretised
+    vector (band, mcc flag, country flag), so the cache stays tiny.
+    """
+
+    features = FEATURES
+
+    def __init__(self, base: float, amount_bands: Sequence[Tuple[float, float]],
+                 mcc_weight: float, country_weight: float):
+        bands = sorted(amount_bands)
+        self._init(base, [b for b, _ in bands], [c for _, c in bands], mcc_weight, country_weight)
+
+    @classmethod
+    def from_arrays(cls, base: float, bounds: Sequence[float], contribs: Sequence[float],
+                    mcc_weight: float, country_weight: float) -> "RuleTable":
+        """Wrap ascending bound/contribution arrays as-is (e.g. memoryviews over a snapshot)."""
+        table = cls.__new__(cls)
+        table._init(base, bounds, contribs, mcc_weight, country_weight)
+        return table
+
+    def _init(self, base, bounds, contribs, mcc_weight, country_weight) -> None:
+        self.expected_value = base
+        self.bounds = bounds
+        self.contribs = contribs
+        self._mcc_weight = mcc_weight
+        self._country_weight = country_weight
+
+    def _band(self, amount: float) -> int:
+        # Number of bounds strictly below amount; 0 is the no-contribution band
+        return bisect_left(self.bounds, amount)
+
+    def _band_contrib(self, band: int) -> float:
+        return self.contribs[band - 1] if band else 0.0
+
+    def signature(self, x: Sequence[float]) -> Hashable:
+        return (self._band(x[0]), x[1] > 0, x[2] > 0)
+
+    def contributions(self, x: Sequence[float]) -> Tuple[float, ...]:
+        return (
+            self._band_contrib(self._band(x[0])),
+            self._mcc_weight if x[1] > 0 else 0.0,
+            self._country_weight if x[2] > 0 else 0.0,
+        )
+
+    def score(self, x: Sequence[float]) -> float:
+        return self.expected_value + sum(self.contributions(x))
+
+    def params(self) -> Dict[str, object]:
+        """Constructor arguments."""
+        return {
+            "base": self.expected_value,
+            "amount_bands": list(zip(self.bounds, self.contribs)),
+            "mcc_weight": self._mcc_weight,
+            "country_weight": self._country_weight,
+        }
+
+
+# ── Tree models (exact TreeSHAP) ─────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class Tree:
+    """
+    Flat binary tree in the XGBoost/sklearn array layout. A node is a leaf when
+    children_left is -1; x[feature] < threshold goes left. cover is the number
+    (or hessian weight) of training rows that reached each node.
+    """
+    children_left: Sequence[int]
+    children_right: Sequence[int]
+    feature: Sequence[int]
+    threshold: Sequence[float]
+    value: Sequence[float]
+    cover: Sequence[float]
+
+    def expected_value(self) -> float:
+        return self._expected(0)
+
+    def _expected(self, j: int) -> float:
+        left, right = self.children_left[j], self.children_right[j]
+        if left < 0:
+            return self.value[j]
+        return (self.cover[left] * self._expected(left)
+                + self.cover[right] * self._expected(right)) / self.cover[j]
+
+
+# Path element: [feature index, zero fraction, one fraction, permutation weight]
+def _extend(path: List[list], pz: float, po: float, pi: int) -> List[list]:
+    path = [list(e) for e in path]
+    depth = len(path)
+    path.append([pi, pz, po, 1.0 if depth == 0 else 0.0])
+    for i in range(depth - 1, -1, -1):
+        path[i + 1][3] += po * path[i][3] * (i + 1) / (depth + 1)
+        path[i][3] = pz * path[i][3] * (depth - i) / (depth + 1)
+    return path
+
+
+def _unwind(path: List[list], i: int) -> List[list]:
+    path = [list(e) for e in path]
+    depth = len(path) - 1
+    pz, po = path[i][1], path[i][2]
+    n = path[depth][3]
+    for j in range(depth - 1, -1, -1):
+        if po != 0:
+            t = path[j][3]
+            path[j][3] = n * (depth + 1) / ((j + 1) * po)
+            n = t - path[j][3] * pz * (depth - j) / (depth + 1)
+        else:
+            path[j][3] = path[j][3] * (depth + 1) / (pz * (depth - j))
+    for j in range(i, depth):
+        path[j][:3] = path[j + 1][:3]
+    return path[:depth]
+
+
+def _unwound_sum(path: List[list], i: int) -> float:
+    depth = len(path) - 1
+    pz, po = path[i][1], path[i][2]
+    n = path[depth][3]
+    total = 0.0
+    if po != 0:
+        for j in range(depth - 1, -1, -1):
+            t = n * (depth + 1) / ((j + 1) * po)
+            total += t
+            n = path[j][3] - t * pz * (depth - j) / (depth + 1)
+    else:
+        for j in range(depth - 1, -1, -1):
+            total += path[j][3] * (depth + 1) / (pz * (depth - j))
+    return total
+
+
+def _tree_shap(tree: Tree, x: Sequence[float], phi: List[float],
+               j: int, path: List[list], pz: float, po: float, pi: int) -> None:
+    path = _extend(path, pz, po, pi)
+    left, right = tree.children_left[j], tree.children_right[j]
+    if left < 0:
+        for i in range(1, len(path)):
+            w = _unwound_sum(path, i)
+            phi[path[i][0]] += w * (path[i][2] - path[i][1]) * tree.value[j]
+        return
+
+    d = tree.feature[j]
+    hot, cold = (left, right) if x[d] < tree.threshold[j] else (right, left)
+    iz = io = 1.0
+    for k in range(1, len(path)):
+        if path[k][0] == d:
+            iz, io = path[k][1], path[k][2]
+            path = _unwind(path, k)
+            break
+    cover = tree.cover[j]
+    _tree_shap(tree, x, phi, hot, path, iz * tree.cover[hot] / cover, io, d)
+    _tree_shap(tree, x, phi, cold, path, iz * tree.cover[cold] / cover, 0.0, d)
+
+
+class TreeEnsemble:
+    """
+    Additive tree ensemble (margin space) explained with exact TreeSHAP.
+    features names the model's input columns, in the order trees index them.
+    """
+
+    def __init__(self, trees: Sequence[Tree], features: Sequence[str] = FEATURES, base_score: float = 0.0):
+        self.trees = list(trees)
+        self.features = tuple(features)
+        used = max((f for t in self.trees for f, l in zip(t.feature, t.children_left) if l >= 0), default=-1)
+        if used >= len(self.features):
+            raise ValueError(f"trees split on feature {used} but only {len(self.features)} features are named")
+        self.expected_value = base_score + sum(t.expected_value() for t in self.trees)
+        self._base_score = base_score
+
+    def signature(self, x: Sequence[float]) -> Hashable:
+        return tuple(x)
+
+    def contributions(self, x: Sequence[float]) -> Tuple[float, ...]:
+        phi = [0.0] * len(self.features)
+        for tree in self.trees:
+            _tree_shap(tree, x, phi, 0, [], 1.0, 1.0, -1)
+        return tuple(phi)
+
+    def score(self, x: Sequence[float]) -> float:
+        total = self._base_score
+        for t in self.trees:
+            j = 0
+            while t.children_left[j] >= 0:
+                j = t.children_left[j] if x[t.feature[j]] < t.threshold[j] else t.children_right[j]
+            total += t.value[j]
+        return total
+
+
+# ── Reason engine ────────────────────────────────────────────────────────────
+
+class ReasonEngine:
+    """
+    Maps the top-k positive contributions of a source (RuleTable/TreeEnsemble)
+    to reason codes. Ranking is cached per signature in a bounded LRU.
+    """
+
+    def __init__(self, source, codes: Mapping[str, ReasonCode], top_k: int = 3,
+                 min_contribution: float = 0.0, cache_size: int = 4096):
+        self.source = source
+        self.codes = dict(codes)
+        self.top_k = top_k
+        self.min_contribution = min_contribution
+        self._cache: "OrderedDict[Hashable, Tuple[Tuple[str, float], ...]]" = OrderedDict()
+        self._cache_size = cache_size
+
+    def _ranked(self, x: Sequence[float], sig: Optional[Hashable] = None) -> Tuple[Tuple[str, float], ...]:
+        if sig is None:
+            sig = self.source.signature(x)
+        ranked = self._cache.get(sig)
+        if ranked is not None:
+            self._cache.move_to_end(sig)
+            return ranked
+
+        features = self.source.features
+        contribs = self.source.contributions(x)
+        order = sorted(range(len(features)), key=lambda i: contribs[i], reverse=True)
+        ranked = tuple(
+            (features[i], contribs[i]) for i in order
+            if contribs[i] > self.min_contribution and features[i] in self.codes
+        )[: self.top_k]
+
+        self._cache[sig] = ranked
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return ranked
+
+    def _render(self, ranked: Tuple[Tuple[str, float], ...], context: Mapping[str, object]) -> List[Reason]:
+        reasons = []
+        for feature, contribution in ranked:
+            rc = self.codes[feature]
+            reasons.append(Reason(rc.code, feature, round(contribution, 4), rc.template.format(**context)))
+        return reasons
+
+    def explain(self, x: Sequence[float], context: Optional[Mapping[str, object]] = None) -> List[Reason]:
+        return self._render(self._ranked(x), context or {})
+
+    def explain_batch(self, rows: Sequence[Tuple[Sequence[float], Mapping[str, object]]]) -> List[List[Reason]]:
+        """
+        Explain many (vector, context) rows. Rows are grouped by signature and
+        each group is ranked once, then only the message templates run per row.
+        """
+        groups: Dict[Hashable, List[int]] = {}
+        for i, (x, _) in enumerate(rows):
+            groups.setdefault(self.source.signature(x), []).append(i)
+
+        out: List[List[Reason]] = [[] for _ in rows]
+        for sig, idxs in groups.items():
+            ranked = self._ranked(rows[idxs[0]][0], sig)
+            for i in idxs:
+                out[i] = self._render(ranked, rows[i][1] or {})
+        return out
+
+    def messages(self, x: Sequence[float], context: Optional[Mapping[str, object]] = None) -> List[str]:
+        return [r.message for r in self.explain(x, context)]
+
+    def cache_info(self) -> Dict[str, int]:
+        return {"size": len(self._cache), "max_size": self._cache_size}
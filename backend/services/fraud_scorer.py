@@ -2,22 +2,81 @@
 Fraud scoring service — simulates the full ML ensemble inference pipeline.
 In production this calls the actual XGBoost, LightGBM, IsolationForest, and Autoencoder models via MLflow.
 """
+import asyncio
 import random
 import time
 import uuid
 from datetime import datetime
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 from models.schemas import (
     TransactionRequest, FraudPredictionResponse,
     ModelScores, VelocityFlags
 )
+from services.explainer import ReasonCode, ReasonEngine, RuleTable, feature_vector
 
 # High-risk merchant category codes
 HIGH_RISK_MCC = {"6051", "5944", "7994", "7801", "7802", "5912", "4829"}
 # High-risk countries
 HIGH_RISK_COUNTRIES = {"NG", "RU", "KP", "IR", "MM", "VE", "CU", "SY"}
 
+# Rule contributions — the scorer and the reason engine read the same table
+RULES = RuleTable(
+    base=0.1,
+    amount_bands=[(5000, 0.3), (2000, 0.2), (1000, 0.1)],
+    mcc_weight=0.25,
+    country_weight=0.2,
+)
+REASON_CODES = {
+    "amount":            ReasonCode("R01_AMOUNT",  "Unusually large transaction amount (${amount:.2f})"),
+    "high_risk_mcc":     ReasonCode("R02_MCC",     "High-risk merchant category (MCC: {mcc})"),
+    "high_risk_country": ReasonCode("R03_COUNTRY", "High-risk origin country ({country})"),
+}
+REASONS = ReasonEngine(RULES, REASON_CODES, min_contribution=0.15)
+
+
+# Snapshot the scorer currently reads from (None until startup installs one)
+SNAPSHOT = None
+
+
+def compile_state() -> Tuple[Dict[str, object], Dict[str, tuple]]:
+    """
+    Compile scoring state from its sources into (meta, arrays) for the startup
+    snapshot. Only called when the snapshot is missing or stale.
+    """
+    rules = RULES.params()
+    meta = {
+        "high_risk_mcc": sorted(HIGH_RISK_MCC),
+        "high_risk_countries": sorted(HIGH_RISK_COUNTRIES),
+        "rules": {k: rules[k] for k in ("base", "mcc_weight", "country_weight")},
+        "min_contribution": REASONS.min_contribution,
+    }
+    arrays = {
+        "amount_bounds":  ("d", list(RULES.bounds)),
+        "amount_contrib": ("d", list(RULES.contribs)),
+    }
+    return meta, arrays
+
+
+def install_state(snap) -> None:
+    """
+    Read scoring state from a mapped snapshot. Rule tables index the snapshot's
+    memoryviews directly, and SNAPSHOT keeps the mapping alive for the process.
+    """
+    global SNAPSHOT, HIGH_RISK_MCC, HIGH_RISK_COUNTRIES, RULES, REASONS
+    meta = snap.meta
+    rules = meta["rules"]
+    HIGH_RISK_MCC = frozenset(meta["high_risk_mcc"])
+    HIGH_RISK_COUNTRIES = frozenset(meta["high_risk_countries"])
+    RULES = RuleTable.from_arrays(rules["base"], snap.array("amount_bounds"), snap.array("amount_contrib"),
+                                  rules["mcc_weight"], rules["country_weight"])
+    REASONS = ReasonEngine(RULES, REASON_CODES, min_contribution=meta["min_contribution"])
+    SNAPSHOT = snap
+
+
+def _features(tx: TransactionRequest) -> tuple:
+    return feature_vector(tx.amount, tx.merchant.mcc, tx.device.country, HIGH_RISK_MCC, HIGH_RISK_COUNTRIES)
+
 
 def _get_risk_level(score: float) -> str:
     if score >= 0.90:
@@ -39,19 +98,9 @@ def _get_decision(score: float) -> str:
     return "APPROVED"
 
 
-def _compute_fraud_reasons(tx: TransactionRequest, score: float) -> List[str]:
-    reasons = []
-    if tx.amount > 2000:
-        reasons.append(f"Unusually large transaction amount (${tx.amount:.2f})")
-    if tx.merchant.mcc in HIGH_RISK_MCC:
-        reasons.append(f"High-risk merchant category (MCC: {tx.merchant.mcc})")
-    if tx.device.country in HIGH_RISK_COUNTRIES:
-        reasons.append(f"High-risk origin country ({tx.device.country})")
-    if score > 0.7 and random.random() > 0.4:
-        reasons.append("Behavioral anomaly detected (Autoencoder reconstruction error > threshold)")
-    if score > 0.6 and random.random() > 0.5:
-        reasons.append("Geographic velocity: transaction location inconsistent with recent history")
-    return reasons
+def _compute_fraud_reasons(tx: TransactionRequest) -> List[str]:
+    context = {"amount": tx.amount, "mcc": tx.merchant.mcc, "country": tx.device.country}
+    return REASONS.messages(_features(tx), context)
 
 
 def score_transaction(tx: TransactionRequest) -> Tuple[float, bool]:
@@ -60,23 +109,7 @@ def score_transaction(tx: TransactionRequest) -> Tuple[float, bool]:
     In production: loads XGBoost/LightGBM from MLflow registry, 
     fetches features from Feast, and queries Redis for velocity windows.
     """
-    base_risk = 0.1
-    
-    # Amount signal
-    if tx.amount > 5000:
-        base_risk += 0.3
-    elif tx.amount > 2000:
-        base_risk += 0.2
-    elif tx.amount > 1000:
-        base_risk += 0.1
-
-    # MCC signal
-    if tx.merchant.mcc in HIGH_RISK_MCC:
-        base_risk += 0.25
-
-    # Country signal
-    if tx.device.country in HIGH_RISK_COUNTRIES:
-        base_risk += 0.2
+    base_risk = RULES.score(_features(tx))
 
     # Add noise to simulate real ML variance
     base_risk += random.gauss(0, 0.05)
@@ -84,6 +117,40 @@ def score_transaction(tx: TransactionRequest) -> Tuple[float, bool]:
     return base_risk
 
 
+def run_rules_only(tx: TransactionRequest) -> FraudPredictionResponse:
+    """
+    Degraded decision used by admission control when /predict is shed:
+    rule table only, no model calls or feature-store I/O.
+    """
+    t0 = time.perf_counter()
+    score = max(0.0, min(1.0, RULES.score(_features(tx))))
+    rounded = round(score, 4)
+
+    return FraudPredictionResponse(
+        transaction_id=f"TXN-{uuid.uuid4().hex[:8].upper()}",
+        risk_score=rounded,
+        risk_level=_get_risk_level(score),
+        decision=_get_decision(score),
+        fraud_reasons=_compute_fraud_reasons(tx),
+        model_scores=ModelScores(
+            xgboost=rounded,
+            lightgbm=rounded,
+            isolation_forest=rounded,
+            autoencoder=rounded,
+            ensemble=rounded,
+        ),
+        velocity_flags=VelocityFlags(
+            last_1h_count=0,
+            last_24h_amount=0.0,
+            unusual_amount=tx.amount > 2000,
+            geo_velocity=tx.device.country in HIGH_RISK_COUNTRIES,
+            new_device=False,
+        ),
+        latency_ms=round((time.perf_counter() - t0) * 1000, 2),
+        timestamp=datetime.utcnow(),
+    )
+
+
 async def run_inference(tx: TransactionRequest) -> FraudPredictionResponse:
     t0 = time.perf_counter()
     
@@ -96,14 +163,13 @@ async def run_inference(tx: TransactionRequest) -> FraudPredictionResponse:
     ae  = min(1.0, max(0.0, ensemble_score + random.gauss(0, 0.05)))
 
     # Simulate async I/O (Redis velocity lookup + Feast feature fetch)
-    import asyncio
     await asyncio.sleep(0.005)
 
     latency_ms = (time.perf_counter() - t0) * 1000
 
     risk_level = _get_risk_level(ensemble_score)
     decision   = _get_decision(ensemble_score)
-    reasons    = _compute_fraud_reasons(tx, ensemble_score)
+    reasons    = _compute_fraud_reasons(tx)
 
     return FraudPredictionResponse(
         transaction_id=f"TXN-{uuid.uuid4().hex[:8].upper()}",
@@ -0,0 +1,159 @@
+"""
+Scoring-state snapshot — one file that workers mmap copy-on-write at boot.
+
+Layout:
+  MAGIC (8 bytes) | header length (uint64) | JSON header | padding | arrays...
+The JSON header holds scalar/set state plus an index {name: [typecode, offset, count]}
+of numeric arrays. Arrays are 8-byte aligned and returned as memoryviews over a
+copy-on-write (MAP_PRIVATE) mapping; fraud_scorer indexes them in place, so their
+pages stay shared between workers. Only the small JSON header (scalars and
+blocklists) is parsed into per-process objects.
+
+Build ahead of time (e.g. in the image build) with:
+    python -m services.snapshot /path/to/scoring.snap
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+MAGIC = b"FSSNAP01"
+_PREFIX = struct.Struct("<8sQ")
+_ALIGN = 8
+
+DEFAULT_PATH = os.environ.get(
+    "SCORING_SNAPSHOT",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".snapshot", "scoring.snap"),
+)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class Snapshot:
+    """A mapped snapshot. Keep a reference for as long as its arrays are in use."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, header_len = _PREFIX.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a scoring snapshot")
+        header = json.loads(self._map[_PREFIX.size:_PREFIX.size + header_len])
+        self.path = path
+        self.meta: Dict[str, object] = header["meta"]
+        self._index: Dict[str, list] = header["arrays"]
+
+    def array(self, name: str) -> memoryview:
+        typecode, offset, count = self._index[name]
+        size = array(typecode).itemsize
+        return memoryview(self._map)[offset:offset + count * size].cast(typecode)
+
+
+def write_snapshot(path: str, meta: Mapping[str, object],
+                   arrays: Mapping[str, Tuple[str, Sequence]] = None) -> None:
+    """Atomically write meta plus {name: (typecode, values)} arrays to path."""
+    packed = {name: array(typecode, values) for name, (typecode, values) in (arrays or {}).items()}
+
+    # Offsets depend on the header length, which depends on the offsets: iterate to a fixpoint
+    index: Dict[str, list] = {name: [a.typecode, 0, len(a)] for name, a in packed.items()}
+    while True:
+        header = json.dumps({"meta": meta, "arrays": index}, sort_keys=True).encode()
+        offset = _aligned(_PREFIX.size + len(header))
+        changed = False
+        for name, a in packed.items():
+            if index[name][1] != offset:
+                index[name][1], changed = offset, True
+            offset = _aligned(offset + len(a) * a.itemsize)
+        if not changed:
+            break
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        for name, a in packed.items():
+            f.write(b"\0" * (index[name][1] - f.tell()))
+            a.tofile(f)
+    # Other workers may race to build the same file; rename keeps every reader consistent
+    os.replace(tmp, path)
+
+
+def _aligned(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+# ── Scoring state ────────────────────────────────────────────────────────────
+
+# Bump when the snapshot layout or compile_state output changes
+SNAPSHOT_VERSION = 1
+
+_SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+# Code that defines the compiled state; hashed by content (small files)
+_CODE_SOURCES = [os.path.join(_SERVICES_DIR, f) for f in ("fraud_scorer.py", "explainer.py", "snapshot.py")]
+
+
+def _artifact_paths() -> List[str]:
+    """Model, rule and blocklist files, from SCORING_ARTIFACTS (os.pathsep-separated)."""
+    return [p for p in os.environ.get("SCORING_ARTIFACTS", "").split(os.pathsep) if p]
+
+
+def source_fingerprint() -> str:
+    """
+    Identify the inputs the snapshot was compiled from without compiling them:
+    code by content, artifacts by size and mtime so large models are never read.
+    """
+    h = hashlib.sha256(f"v{SNAPSHOT_VERSION}".encode())
+    for path in _CODE_SOURCES:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    for path in _artifact_paths():
+        try:
+            st = os.stat(path)
+            h.update(f"{path}:{st.st_size}:{st.st_mtime_ns}".encode())
+        except FileNotFoundError:
+            h.update(f"{path}:missing".encode())
+    return h.hexdigest()[:16]
+
+
+def build(path: str = DEFAULT_PATH) -> None:
+    """Compile scoring state from its sources into a snapshot at path."""
+    from services.fraud_scorer import compile_state
+
+    meta, arrays = compile_state()
+    write_snapshot(path, dict(meta, fingerprint=source_fingerprint()), arrays)
+
+
+def load(path: str = DEFAULT_PATH) -> Snapshot:
+    """
+    Map the snapshot at path and make it the state fraud_scorer reads from.
+    Staleness is judged from the sources alone; compile_state only runs when
+    the snapshot is missing, unreadable or built from different sources.
+    """
+    from services.fraud_scorer import install_state
+
+    expected = source_fingerprint()
+    snap = None
+    if os.path.exists(path):
+        try:
+            snap = Snapshot(path)
+        except (SnapshotError, ValueError, struct.error):
+            snap = None
+    if snap is None or snap.meta.get("fingerprint") != expected:
+        build(path)
+        snap = Snapshot(path)
+
+    install_state(snap)
+    return snap
+
+
+if __name__ == "__main__":
+    import sys
+    target = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    build(target)
+    print(f"wrote {target} ({os.path.getsize(target)} bytes)")
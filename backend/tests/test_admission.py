@@ -0,0 +1,193 @@
+import asyncio
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+from services.admission import (
+    ADMITTED, AUTHORIZATION, HISTORY, OVERLOADED, RATE_LIMITED, AdmissionController,
+    AdmissionMiddleware, _client_keys, _parse_networks,
+)
+
+
+def _controller(**kwargs) -> AdmissionController:
+    params = dict(max_concurrency=4, rate=1.0, burst=3.0, ip_rate=1.0, ip_burst=10.0, shm_name=None)
+    params.update(kwargs)
+    return AdmissionController(**params)
+
+
+def _call(middleware, method: str, path: str, body: bytes = b"", ip: str = "10.0.9.1"):
+    """Run one request through the middleware; returns (status, headers, body, reached_app)."""
+    reached = []
+
+    async def app(scope, receive, send):
+        reached.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    middleware.app = app
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "client": (ip, 5000),
+             "query_string": b"", "root_path": "", "scheme": "http", "server": ("test", 80)}
+    asyncio.run(middleware(scope, receive, send))
+    start = messages[0]
+    headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], headers, b"".join(m.get("body", b"") for m in messages[1:]), bool(reached)
+
+
+def _middleware(controller: AdmissionController) -> AdmissionMiddleware:
+    return AdmissionMiddleware(None, controller=controller, predict_fallback=True, trusted_proxies="")
+
+
+def _saturate(controller: AdmissionController) -> None:
+    while controller.admit("10.0.8.1", None, AUTHORIZATION) == ADMITTED:
+        pass
+
+
+_PREDICT_BODY = json.dumps({
+    "amount": 4999.99,
+    "merchant": {"name": "Binance Crypto", "mcc": "6051", "country": "MT"},
+    "device": {"fingerprint": "fp", "ip_address": "185.33.21.99", "country": "MT"},
+}).encode()
+
+
+def test_rotating_api_keys_are_bounded_by_the_ip_bucket():
+    c = _controller()
+    verdicts = [c.admit("10.0.0.1", f"key-{i}", HISTORY, hold=False) for i in range(20)]
+    assert verdicts.count(ADMITTED) == 10
+    assert verdicts[-1] == RATE_LIMITED
+    # Another address is unaffected
+    assert c.admit("10.0.0.2", None, HISTORY, hold=False) == ADMITTED
+
+
+def test_api_key_bucket_applies_across_addresses():
+    c = _controller()
+    verdicts = [c.admit(f"10.0.1.{i}", "merchant-a", HISTORY, hold=False) for i in range(5)]
+    assert verdicts == [ADMITTED] * 3 + [RATE_LIMITED] * 2
+
+
+def test_full_table_does_not_evict_active_buckets():
+    c = _controller(bucket_slots=8, ip_burst=3.0)
+    for i in range(8):
+        c.admit(f"10.0.2.{i}", None, HISTORY, hold=False)
+    # All probed slots hold partly drained buckets: a newcomer is refused, not given a burst
+    assert c.admit("10.0.3.1", None, HISTORY, hold=False) == RATE_LIMITED
+    assert c.admit("10.0.2.0", None, HISTORY, hold=False) == ADMITTED
+
+
+def test_lower_priority_classes_are_shed_first():
+    c = _controller(ip_burst=100.0)
+    assert [c.admit("10.0.4.1", None, AUTHORIZATION) for _ in range(2)] == [ADMITTED] * 2
+    assert c.admit("10.0.4.1", None, HISTORY) == OVERLOADED
+    assert c.admit("10.0.4.1", None, AUTHORIZATION) == ADMITTED
+    c.release(AUTHORIZATION)
+    assert c.snapshot()["in_flight"]["authorization"] == 2
+
+
+def test_last_worker_unlinks_shared_segment():
+    c = AdmissionController(bucket_slots=16, shm_name=f"fraudshield_test_{os.getpid()}")
+    if not c.snapshot()["shared"]:
+        pytest.skip("shared memory unavailable")
+    path = f"/dev/shm/fraudshield_test_{os.getpid()}_16"
+    assert os.path.exists(path)
+    c.close()
+    assert not os.path.exists(path)
+
+
+def test_lifespan_shutdown_unlinks_shared_segment(monkeypatch):
+    name = f"fraudshield_lifespan_{os.getpid()}"
+    monkeypatch.setenv("ADMISSION_SHM_NAME", name)
+    sys.modules.pop("main", None)
+    main = importlib.import_module("main")
+    if not main.admission.snapshot()["shared"]:
+        pytest.skip("shared memory unavailable")
+
+    async def no_boot(report):
+        pass
+
+    monkeypatch.setattr(main, "boot", no_boot)
+    path = f"/dev/shm/{name}_4096"
+    events = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+    seen = []
+
+    async def receive():
+        seen.append(os.path.exists(path))
+        return next(events)
+
+    async def send(message):
+        seen.append(message["type"])
+
+    asyncio.run(main.app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive, send))
+    sys.modules.pop("main", None)
+
+    assert seen == [True, "lifespan.startup.complete", True, "lifespan.shutdown.complete"]
+    assert not os.path.exists(path)
+
+
+def test_client_ip_comes_from_trusted_forwarded_for():
+    proxies = _parse_networks("10.0.0.0/8")
+    scope = {"client": ("10.1.2.3", 5000),
+             "headers": [(b"x-forwarded-for", b"6.6.6.6, 203.0.113.9, 10.9.9.9")]}
+    # The client-supplied 6.6.6.6 is ignored; 203.0.113.9 is what our proxy saw
+    assert _client_keys(scope, proxies) == ("203.0.113.9", None)
+    # Without a trusted peer the header is not believed
+    assert _client_keys(scope) == ("10.1.2.3", None)
+    assert _client_keys(dict(scope, client=("198.51.100.7", 5000)), proxies)[0] == "198.51.100.7"
+
+
+def test_zero_ip_rate_disables_the_ip_bucket():
+    c = _controller(ip_rate=0.0)
+    assert all(c.admit("10.0.5.1", None, HISTORY, hold=False) == ADMITTED for _ in range(50))
+
+
+def test_middleware_rate_limit_answers_429_with_retry_after():
+    m = _middleware(_controller(ip_burst=1.0, ip_rate=0.001))
+    assert _call(m, "GET", "/api/v1/transactions")[0] == 200
+    status, headers, _, reached = _call(m, "GET", "/api/v1/transactions")
+    assert (status, headers["retry-after"], reached) == (429, "1", False)
+
+
+def test_middleware_sheds_dashboard_and_history_with_503():
+    c = _controller(ip_burst=100.0)
+    m = _middleware(c)
+    c.admit("10.0.8.1", None, AUTHORIZATION)
+    c.admit("10.0.8.1", None, AUTHORIZATION)
+    # 2 in flight: history (share 0.5 of 4) is shed, dashboard (0.75) still fits
+    status, headers, _, reached = _call(m, "GET", "/api/v1/transactions")
+    assert (status, headers["retry-after"], reached) == (503, "1", False)
+    assert _call(m, "GET", "/api/v1/metrics")[0] == 200
+    c.admit("10.0.8.1", None, AUTHORIZATION)
+    status, headers, _, reached = _call(m, "GET", "/api/v1/metrics")
+    assert (status, headers["retry-after"], reached) == (503, "1", False)
+    assert c.snapshot()["in_flight"] == {"authorization": 3, "dashboard": 0, "history": 0}
+
+
+def test_middleware_shed_predict_falls_back_to_rules_only():
+    c = _controller(ip_burst=100.0)
+    m = _middleware(c)
+    _saturate(c)
+    status, headers, body, reached = _call(m, "POST", "/api/v1/predict", _PREDICT_BODY)
+    assert (status, headers["x-fraudshield-degraded"], reached) == (200, "rules-only", False)
+    assert json.loads(body)["risk_score"] > 0
+
+    status, headers, _, reached = _call(m, "POST", "/api/v1/predict", b'{"amount": -1}')
+    assert (status, headers["retry-after"], reached) == (503, "1", False)
+    assert "x-fraudshield-degraded" not in headers
+
+
+def test_middleware_bypasses_options_and_health():
+    c = _controller(ip_burst=100.0)
+    m = _middleware(c)
+    _saturate(c)
+    assert _call(m, "OPTIONS", "/api/v1/transactions")[::3] == (200, True)
+    for path in ("/health", "/health/ready", "/docs"):
+        assert _call(m, "GET", path)[::3] == (200, True)
@@ -0,0 +1,138 @@
+import itertools
+import math
+import random
+
+import pytest
+
+from services.explainer import (
+    FEATURES, ReasonCode, ReasonEngine, RuleTable, Tree, TreeEnsemble,
+)
+
+M = len(FEATURES)
+
+
+def _random_tree(rng: random.Random, max_depth: int = 4, m: int = M) -> Tree:
+    left, right, feature, threshold, value, cover = [], [], [], [], [], []
+
+    def node(depth: int) -> int:
+        j = len(left)
+        for arr in (left, right, feature, threshold, value, cover):
+            arr.append(0)
+        if depth == max_depth or (depth > 0 and rng.random() < 0.3):
+            left[j] = right[j] = feature[j] = -1
+            value[j] = rng.uniform(-1, 1)
+            cover[j] = rng.randint(1, 50)
+            return j
+        feature[j] = rng.randrange(m)
+        threshold[j] = rng.uniform(0, 1)
+        left[j] = node(depth + 1)
+        right[j] = node(depth + 1)
+        cover[j] = cover[left[j]] + cover[right[j]]
+        return j
+
+    node(0)
+    return Tree(left, right, feature, threshold, value, cover)
+
+
+def _cond_expectation(tree: Tree, x, known, j: int = 0) -> float:
+    l, r = tree.children_left[j], tree.children_right[j]
+    if l < 0:
+        return tree.value[j]
+    d = tree.feature[j]
+    if d in known:
+        return _cond_expectation(tree, x, known, l if x[d] < tree.threshold[j] else r)
+    return (tree.cover[l] * _cond_expectation(tree, x, known, l)
+            + tree.cover[r] * _cond_expectation(tree, x, known, r)) / tree.cover[j]
+
+
+def _brute_force_shap(tree: Tree, x):
+    m = len(x)
+    phi = [0.0] * m
+    for i in range(m):
+        others = [k for k in range(m) if k != i]
+        for size in range(m):
+            w = math.factorial(size) * math.factorial(m - size - 1) / math.factorial(m)
+            for subset in itertools.combinations(others, size):
+                s = set(subset)
+                phi[i] += w * (_cond_expectation(tree, x, s | {i}) - _cond_expectation(tree, x, s))
+    return phi
+
+
+def test_tree_shap_matches_brute_force_shapley():
+    rng = random.Random(7)
+    for _ in range(100):
+        tree = _random_tree(rng)
+        ensemble = TreeEnsemble([tree])
+        x = [rng.uniform(0, 1) for _ in range(M)]
+        phi = ensemble.contributions(x)
+        assert phi == pytest.approx(_brute_force_shap(tree, x), abs=1e-12)
+        assert ensemble.expected_value + sum(phi) == pytest.approx(ensemble.score(x), abs=1e-12)
+
+
+def test_tree_ensemble_is_additive_across_trees():
+    rng = random.Random(11)
+    trees = [_random_tree(rng) for _ in range(5)]
+    ensemble = TreeEnsemble(trees, base_score=-0.5)
+    x = [rng.uniform(0, 1) for _ in range(M)]
+    assert ensemble.expected_value + sum(ensemble.contributions(x)) == pytest.approx(ensemble.score(x))
+
+
+def test_tree_shap_supports_wider_feature_layouts():
+    rng = random.Random(23)
+    features = tuple(f"f{i}" for i in range(6))
+    for _ in range(20):
+        tree = _random_tree(rng, m=len(features))
+        ensemble = TreeEnsemble([tree], features)
+        x = [rng.uniform(0, 1) for _ in features]
+        assert ensemble.contributions(x) == pytest.approx(_brute_force_shap(tree, x), abs=1e-12)
+
+    # Splits on the last column rank under its own name
+    tree = Tree([1, -1, -1], [2, -1, -1], [5, -1, -1], [0.5, 0, 0], [0, 0.0, 1.0], [2, 1, 1])
+    engine = ReasonEngine(TreeEnsemble([tree], features), {"f5": ReasonCode("F5", "f5 high")})
+    assert engine.messages([0, 0, 0, 0, 0, 0.9]) == ["f5 high"]
+
+
+def test_tree_ensemble_rejects_unnamed_split_features():
+    tree = Tree([1, -1, -1], [2, -1, -1], [3, -1, -1], [0.5, 0, 0], [0, 0.0, 1.0], [2, 1, 1])
+    with pytest.raises(ValueError):
+        TreeEnsemble([tree])
+
+
+def test_rule_table_round_trips_through_params():
+    table = RuleTable(base=0.1, amount_bands=[(1000, 0.1), (5000, 0.3), (2000, 0.2)],
+                      mcc_weight=0.25, country_weight=0.2)
+    clone = RuleTable(**table.params())
+    for amount in (10, 1000, 1000.01, 2500, 5000, 9999):
+        for mcc in (0.0, 1.0):
+            for country in (0.0, 1.0):
+                x = (amount, mcc, country)
+                assert clone.signature(x) == table.signature(x)
+                assert clone.contributions(x) == table.contributions(x)
+                assert clone.score(x) == pytest.approx(table.expected_value + sum(table.contributions(x)))
+
+
+def test_explain_batch_ranks_each_signature_once():
+    table = RuleTable(base=0.1, amount_bands=[(2000, 0.2)], mcc_weight=0.25, country_weight=0.2)
+    calls = []
+
+    class Counting:
+        features = table.features
+        signature = staticmethod(table.signature)
+
+        @staticmethod
+        def contributions(x):
+            calls.append(x)
+            return table.contributions(x)
+
+    engine = ReasonEngine(Counting(), {
+        "amount": ReasonCode("A", "amount {amount}"),
+        "high_risk_mcc": ReasonCode("M", "mcc {mcc}"),
+    })
+    rows = [((a, 1.0, 0.0), {"amount": a, "mcc": "6051"}) for a in (2500, 3000, 100, 150, 4000)]
+    batch = engine.explain_batch(rows)
+
+    assert len(calls) == 2
+    assert [[r.message for r in reasons] for reasons in batch] == [
+        engine.messages(x, ctx) for x, ctx in rows
+    ]
+    assert batch[1][1].message == "amount 3000"
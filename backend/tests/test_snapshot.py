@@ -0,0 +1,49 @@
+import pytest
+
+from services import fraud_scorer, snapshot
+
+
+@pytest.fixture
+def scorer_state(monkeypatch):
+    """Let load() swap fraud_scorer globals, restoring them afterwards."""
+    for name in ("SNAPSHOT", "HIGH_RISK_MCC", "HIGH_RISK_COUNTRIES", "RULES", "REASONS"):
+        monkeypatch.setattr(fraud_scorer, name, getattr(fraud_scorer, name))
+    return fraud_scorer
+
+
+def test_load_reads_rules_from_the_mapping(tmp_path, scorer_state):
+    source = scorer_state.RULES
+    path = str(tmp_path / "scoring.snap")
+    snap = snapshot.load(path)
+
+    assert scorer_state.SNAPSHOT is snap
+    assert isinstance(scorer_state.RULES.bounds, memoryview)
+    for amount in (10, 1000, 1000.5, 2500, 5000, 8000):
+        for flags in ((0.0, 0.0), (1.0, 0.0), (1.0, 1.0)):
+            x = (amount, *flags)
+            assert scorer_state.RULES.signature(x) == source.signature(x)
+            assert scorer_state.RULES.score(x) == pytest.approx(source.score(x))
+
+
+def test_fresh_snapshot_is_not_recompiled(tmp_path, scorer_state, monkeypatch):
+    path = str(tmp_path / "scoring.snap")
+    snapshot.build(path)
+
+    def fail():
+        raise AssertionError("compile_state ran for a fresh snapshot")
+
+    monkeypatch.setattr(scorer_state, "compile_state", fail)
+    snapshot.load(path)
+
+
+def test_changed_artifact_rebuilds(tmp_path, scorer_state, monkeypatch):
+    artifact = tmp_path / "blocklist.txt"
+    artifact.write_text("6051\n")
+    monkeypatch.setenv("SCORING_ARTIFACTS", str(artifact))
+    path = str(tmp_path / "scoring.snap")
+    snapshot.build(path)
+    before = snapshot.Snapshot(path).meta["fingerprint"]
+
+    artifact.write_text("6051\n5944\n")
+    snapshot.load(path)
+    assert snapshot.Snapshot(path).meta["fingerprint"] != before
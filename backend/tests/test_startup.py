@@ -0,0 +1,25 @@
+import asyncio
+
+from services import fraud_scorer, snapshot
+from services.startup import BootReport, boot, warmup
+
+
+def test_warmup_runs_at_least_one_round():
+    for max_rounds in (0, -3):
+        result = asyncio.run(warmup(max_rounds=max_rounds))
+        assert result["rounds"] == 1
+        assert result["p99_ms"] > 0
+
+
+def test_unwritable_snapshot_path_still_becomes_ready(monkeypatch):
+    load = snapshot.load
+    monkeypatch.setattr(snapshot, "load", lambda: load("/proc/nope/scoring.snap"))
+    rules = fraud_scorer.RULES
+
+    report = BootReport()
+    asyncio.run(boot(report))
+
+    assert report.ready and report.error is None
+    assert "snapshot_error" in report.details
+    assert fraud_scorer.RULES is rules
+    assert list(report.stages) == ["server", "snapshot", "warmup"]